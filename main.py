@@ -1,12 +1,25 @@
+import asyncio
 import logging
 import os
+import secrets
+from typing import Optional
+from uuid import uuid4
 
 from dotenv import find_dotenv, load_dotenv
-from fastapi import FastAPI, Request
+from fastapi import (
+    FastAPI,
+    Header,
+    HTTPException,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
+from websockets.exceptions import ConnectionClosed
 
 __version__ = "0.0.2"
 
@@ -33,6 +46,12 @@ else:
         file.write(credential)
     logger.info("EE credential file created.")
 
+from src.channel import ProgressCallback, channel
+from src.connections import http_pool
+from src.traffic import REPLAY_HEADER, recorder
+
+recorder.install(http_pool)
+
 from src.gpt import AgentHandler
 from src.utils import JaltolInput, JaltolOutput
 
@@ -49,6 +68,7 @@ async def root(request: Request):
         HTMLResponse: The rendered index.html template.
 
     """
+    channel.conversation_id(request.session)
     return templates.TemplateResponse("index.html", {"request": request})
 
 
@@ -65,13 +85,155 @@ async def jaltol(request: Request, input: JaltolInput):
         JaltolOutput: The output data containing the response text.
 
     """
-    history = request.session.get("history", None)
+    # a conversation checkpointed over WebSocket moves back to the cookie
+    conversation_id = channel.conversation_id(request.session)
+    history = await run_in_threadpool(channel.pop, conversation_id)
+    history = history or request.session.get("history", None)
     logger.debug(f"history={bool(history)}")
     input_dict = input.dict()
     input_text = input_dict["user"]
     logger.info(f"user input={input_text}")
     conversation = AgentHandler(history)
-    response = conversation.query(input_text)
+    # run in the threadpool, so concurrent requests can share EE batches
+    response = await run_in_threadpool(
+        recorder.handle,
+        conversation.query,
+        input_text,
+        conversation_id,
+        request.headers.get(REPLAY_HEADER),
+    )
     logger.debug(f"response from agent={response}")
     request.session["history"] = conversation.serialized_memory
     return {"text": response}
+
+
+async def send_json(websocket: WebSocket, message: dict) -> None:
+    """
+    Sends a JSON message over a WebSocket.
+
+    Args:
+        websocket (WebSocket): The WebSocket connection.
+        message (dict): The message.
+
+    Raises:
+        WebSocketDisconnect: If the client has left, the server raises its
+            own error on send, like ConnectionClosed or ClientDisconnected.
+
+    """
+    try:
+        await websocket.send_json(message)
+    except (ConnectionClosed, OSError) as e:
+        raise WebSocketDisconnect(code=1006) from e
+
+
+@app.websocket("/ws/jaltol/")
+async def jaltol_ws(websocket: WebSocket):
+    """
+    WebSocket endpoint keeping the agent and memory for the whole conversation.
+
+    Messages are received as JaltolInput and answered with JSON messages of
+    type "progress", "answer" or "error". The memory is checkpointed every
+    few turns and on disconnect, instead of after every turn. Once the
+    conversation is taken over by the /jaltol/ route, it is not checkpointed
+    anymore, so the turns taken there are kept.
+
+    Args:
+        websocket (WebSocket): The WebSocket connection.
+
+    """
+    await websocket.accept()
+    if not channel.acquire():
+        # try again later, the client falls back to the /jaltol/ route
+        await websocket.close(code=1013)
+        return
+    try:
+        conversation_id = websocket.session.get("conversation_id") or uuid4().hex
+        history, version = await run_in_threadpool(channel.history, conversation_id)
+        history = history or websocket.session.get("history")
+        logger.debug(f"websocket history={bool(history)}")
+        conversation = await run_in_threadpool(AgentHandler, history)
+    except Exception:
+        channel.release()
+        raise
+
+    progress = ProgressCallback(websocket, asyncio.get_running_loop())
+    turns = 0
+    try:
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    websocket.receive_json(), timeout=channel.idle_timeout
+                )
+                input_text = JaltolInput(**data).user
+            except asyncio.TimeoutError:
+                await websocket.close(code=1000)
+                break
+            except (ValueError, TypeError):
+                message = {"type": "error", "text": "Invalid message."}
+                await send_json(websocket, message)
+                continue
+            logger.info(f"user input={input_text}")
+            await send_json(websocket, {"type": "progress", "text": "Processing..."})
+            response = await run_in_threadpool(
+                recorder.handle,
+                conversation.query,
+                input_text,
+                conversation_id,
+                callbacks=[progress],
+            )
+            logger.debug(f"response from agent={response}")
+            await send_json(websocket, {"type": "answer", "text": response})
+            turns += 1
+            if turns % channel.checkpoint_turns == 0 and version is not None:
+                version = await run_in_threadpool(
+                    channel.checkpoint,
+                    conversation_id,
+                    conversation.serialized_memory,
+                    version,
+                )
+    except WebSocketDisconnect:
+        logger.debug("websocket disconnected")
+    finally:
+        try:
+            # skipped if the conversation was taken over, e.g. by /jaltol/
+            if version is not None:
+                await run_in_threadpool(
+                    channel.checkpoint,
+                    conversation_id,
+                    conversation.serialized_memory,
+                    version,
+                )
+        finally:
+            channel.release()
+
+
+@app.get("/metrics/http")
+async def http_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Endpoint exposing the outbound HTTP pool utilization of the worker.
+
+    Disabled unless METRICS_TOKEN is set, and then requires it as a bearer
+    token, as the metrics expose the upstream hosts.
+
+    Args:
+        authorization (Optional[str]): The Authorization header.
+
+    Returns:
+        dict: The pool metrics for each upstream host.
+
+    """
+    token = os.getenv("METRICS_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404)
+    if not secrets.compare_digest(authorization or "", f"Bearer {token}"):
+        raise HTTPException(status_code=401)
+    return http_pool.metrics()
+
+
+@app.on_event("shutdown")
+def shutdown():
+    """
+    Closes the pooled outbound connections of the worker.
+
+    """
+    http_pool.shutdown()
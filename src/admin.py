@@ -0,0 +1,391 @@
+"""
+Village-level store of precomputed annual values with their admin hierarchy.
+
+Block, district and state values are rolled up from the villages when the
+store is built, so answering an aggregate question is a single lookup.
+
+usage: python -m src.admin Precipitation users/.../villages --years 2015 2022
+                           [--span hydrological] [--state Karnataka]
+
+Run from the project root.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import find_dotenv, load_dotenv
+
+_ = load_dotenv(find_dotenv())
+
+LEVELS = ("block", "district", "state")
+
+# property holding the village area in the precomputed collection
+AREA = "jaltol_area"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS villages (
+    id TEXT PRIMARY KEY,
+    village TEXT,
+    block TEXT,
+    district TEXT,
+    state TEXT,
+    area REAL
+);
+CREATE TABLE IF NOT EXISTS village_values (
+    id TEXT,
+    dataset TEXT,
+    span TEXT,
+    year INTEGER,
+    value REAL,
+    PRIMARY KEY (id, dataset, span, year)
+);
+CREATE TABLE IF NOT EXISTS rollups (
+    level TEXT,
+    state TEXT,
+    district TEXT,
+    block TEXT,
+    name TEXT,
+    dataset TEXT,
+    span TEXT,
+    year INTEGER,
+    value REAL,
+    area REAL,
+    villages INTEGER,
+    PRIMARY KEY (level, state, district, block, dataset, span, year)
+);
+CREATE INDEX IF NOT EXISTS rollups_name ON rollups (level, name);
+"""
+
+# aggregation of the village values for each spatial reducer
+AGGREGATES = {
+    "mean": "SUM(x.value * v.area) / SUM(v.area)",
+    "sum": "SUM(x.value)",
+}
+
+
+def normalize(name: str) -> str:
+    """
+    Normalizes an admin name for lookups.
+
+    Args:
+        name (str): The admin name, like "Tumkur district".
+
+    Returns:
+        str: The lower case name without the admin level words.
+
+    """
+    name = re.sub(r"\s+", " ", name.strip().lower())
+    return re.sub(r" (block|taluk|tehsil|district|state)$", "", name)
+
+
+class AdminStore:
+    """
+    SQLite store of village values and their block, district and state rollups.
+
+    Attributes:
+        path (str): The path to the SQLite database.
+
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._schema = False
+
+    @property
+    def available(self) -> bool:
+        """
+        Whether the store has been built.
+
+        Returns:
+            bool: True if the database file exists.
+
+        """
+        return os.path.isfile(self.path)
+
+    def connect(self, write: bool = False) -> sqlite3.Connection:
+        """
+        Opens a connection to the store.
+
+        Lookups open the database read only and run no DDL, the store and its
+        schema are created by the first write.
+
+        Args:
+            write (bool): Whether to open the store for writing (default: False).
+
+        Returns:
+            sqlite3.Connection: The connection.
+
+        """
+        if write:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            if not self._schema:
+                connection.executescript(SCHEMA)
+                self._schema = True
+        else:
+            uri = Path(self.path).absolute().as_uri() + "?mode=ro"
+            connection = sqlite3.connect(uri, uri=True)
+        connection.row_factory = sqlite3.Row
+        connection.create_function("normalize", 1, normalize)
+        return connection
+
+    def add_villages(self, villages: Iterable[Dict[str, object]]) -> None:
+        """
+        Adds or updates villages with their admin hierarchy and area.
+
+        Args:
+            villages (Iterable[Dict[str, object]]): Villages with id, village, block, district, state and area.
+
+        """
+        with self._lock, closing(self.connect(write=True)) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO villages "
+                "VALUES (:id, :village, :block, :district, :state, :area)",
+                villages,
+            )
+
+    def add_values(
+        self,
+        dataset: str,
+        temporal_span: str,
+        year: int,
+        values: Iterable[Tuple[str, float]],
+    ) -> None:
+        """
+        Adds or updates the annual values of villages.
+
+        Args:
+            dataset (str): The dataset name.
+            temporal_span (str): The temporal span of the year.
+            year (int): The year.
+            values (Iterable[Tuple[str, float]]): The village ids and values.
+
+        """
+        with self._lock, closing(self.connect(write=True)) as connection, connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO village_values VALUES (?, ?, ?, ?, ?)",
+                ((vid, dataset, temporal_span, year, value) for vid, value in values),
+            )
+
+    def rebuild_rollups(
+        self, dataset: str, temporal_span: str, spatial_reducer: str = "mean"
+    ) -> None:
+        """
+        Rebuilds the block, district and state rollups of a dataset.
+
+        Values of datasets reduced by mean are area weighted averages of the
+        village values, and those reduced by sum are totals.
+
+        Args:
+            dataset (str): The dataset name.
+            temporal_span (str): The temporal span of the year.
+            spatial_reducer (str): The spatial reducer of the dataset (default: "mean").
+
+        """
+        aggregate = AGGREGATES[spatial_reducer]
+        with self._lock, closing(self.connect(write=True)) as connection, connection:
+            connection.execute(
+                "DELETE FROM rollups WHERE dataset = ? AND span = ?",
+                (dataset, temporal_span),
+            )
+            for level in LEVELS:
+                hierarchy = LEVELS[LEVELS.index(level) :]
+                columns = ", ".join(
+                    f"v.{column}" if column in hierarchy else "''"
+                    for column in ("state", "district", "block")
+                )
+                group = ", ".join(f"v.{column}" for column in hierarchy)
+                connection.execute(
+                    f"INSERT INTO rollups SELECT '{level}', {columns}, "
+                    f"normalize(v.{level}), x.dataset, x.span, x.year, "
+                    f"{aggregate}, SUM(v.area), COUNT(*) "
+                    "FROM village_values x JOIN villages v ON v.id = x.id "
+                    "WHERE x.dataset = ? AND x.span = ? AND x.value IS NOT NULL "
+                    f"GROUP BY {group}, x.year",
+                    (dataset, temporal_span),
+                )
+
+    def resolve(
+        self,
+        name: str,
+        level: str,
+        state: Optional[str] = None,
+        district: Optional[str] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        Finds the admin units of a level matching a name.
+
+        Args:
+            name (str): The admin name.
+            level (str): One of block, district or state.
+            state (Optional[str]): The state to look in.
+            district (Optional[str]): The district to look in.
+
+        Returns:
+            List[Dict[str, str]]: The level, state, district and block of each match.
+
+        Raises:
+            ValueError: If the level is not supported.
+
+        """
+        if level not in LEVELS:
+            raise ValueError(f"level should be one of {LEVELS}")
+        if not self.available:
+            return []
+        query = (
+            "SELECT DISTINCT level, state, district, block FROM rollups "
+            "WHERE level = ? AND name = ?"
+        )
+        params = [level, normalize(name)]
+        if state:
+            query += " AND normalize(state) = ?"
+            params.append(normalize(state))
+        if district:
+            query += " AND normalize(district) = ?"
+            params.append(normalize(district))
+        with closing(self.connect()) as connection:
+            return [dict(row) for row in connection.execute(query, params)]
+
+    def rollup(
+        self, unit: Dict[str, str], dataset: str, temporal_span: str, year: int
+    ) -> Optional[float]:
+        """
+        Returns the rolled up value of an admin unit.
+
+        Args:
+            unit (Dict[str, str]): The level, state, district and block of the unit.
+            dataset (str): The dataset name.
+            temporal_span (str): The temporal span of the year.
+            year (int): The year.
+
+        Returns:
+            Optional[float]: The value, or None if it is not precomputed.
+
+        """
+        if not self.available:
+            return None
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT value FROM rollups WHERE level = ? AND state = ? "
+                "AND district = ? AND block = ? AND dataset = ? AND span = ? "
+                "AND year = ?",
+                (
+                    unit["level"],
+                    unit["state"],
+                    unit["district"],
+                    unit["block"],
+                    dataset,
+                    temporal_span,
+                    year,
+                ),
+            ).fetchone()
+        return None if row is None else row["value"]
+
+
+admin_store = AdminStore(os.getenv("ADMIN_STORE_PATH", "data/admin.sqlite3"))
+
+
+def precompute(
+    computation,
+    villages,
+    years: Iterable[int],
+    temporal_span: str,
+    properties: Dict[str, str],
+    store: AdminStore = admin_store,
+    page_size: int = 500,
+) -> None:
+    """
+    Computes the annual values of villages and rolls them up in the store.
+
+    Args:
+        computation (DatasetComputation): The computation of the dataset.
+        villages (ee.FeatureCollection): The village boundaries.
+        years (Iterable[int]): The years to compute.
+        temporal_span (str): The temporal span of the year.
+        properties (Dict[str, str]): The village properties holding id, village, block, district and state.
+        store (AdminStore): The store to fill (default: admin_store).
+        page_size (int): The number of villages reduced per request (default: 500).
+
+    """
+    import ee
+
+    dataset = computation.dataset
+    reducer = dataset.spatial_reducer
+    id_property = properties["id"]
+    villages = villages.map(lambda f: f.set(AREA, f.geometry().area(1)))
+    count = villages.size().getInfo()
+    for offset in range(0, count, page_size):
+        page = ee.FeatureCollection(villages.toList(page_size, offset))
+        features = page.select(list(properties.values()) + [AREA]).getInfo()
+        store.add_villages(
+            {
+                **{key: f["properties"].get(p) for key, p in properties.items()},
+                "area": f["properties"][AREA],
+            }
+            for f in features["features"]
+        )
+        for year in years:
+            reduced = computation.image(year, temporal_span).reduceRegions(
+                collection=page.select([id_property]),
+                reducer=computation.ee_reducer[reducer],
+                scale=computation.asset.scale,
+                crs=computation.asset.projection,
+            )
+            features = reduced.select([id_property, reducer]).getInfo()
+            store.add_values(
+                dataset.name,
+                temporal_span,
+                year,
+                (
+                    (f["properties"][id_property], f["properties"].get(reducer))
+                    for f in features["features"]
+                ),
+            )
+    store.rebuild_rollups(dataset.name, temporal_span, reducer)
+
+
+def main() -> None:
+    """
+    Precomputes a dataset for the villages of an asset from the command line.
+
+    """
+    parser = argparse.ArgumentParser(description="Precompute village values and admin rollups.")
+    parser.add_argument("dataset", help="registered dataset name, like Precipitation")
+    parser.add_argument("villages", help="Earth Engine asset of the village boundaries")
+    parser.add_argument("--years", type=int, nargs=2, required=True, metavar=("FIRST", "LAST"))
+    parser.add_argument("--span", default="hydrological", help="temporal span of the year")
+    parser.add_argument("--state", help="only precompute the villages of this state")
+    for key in ("id", "village", "block", "district", "state"):
+        parser.add_argument(f"--{key}-property", default=key, help=f"property holding the {key}")
+    args = parser.parse_args()
+
+    import ee
+
+    import src.components.evapotranspiration  # noqa: F401
+    import src.components.precipitation  # noqa: F401
+    from src.components.registry import registry
+
+    properties = {
+        key: getattr(args, f"{key}_property")
+        for key in ("id", "village", "block", "district", "state")
+    }
+    villages = ee.FeatureCollection(args.villages)
+    if args.state:
+        villages = villages.filter(ee.Filter.eq(properties["state"], args.state))
+    precompute(
+        registry.computations[args.dataset],
+        villages,
+        range(args.years[0], args.years[1] + 1),
+        args.span,
+        properties,
+    )
+
+
+if __name__ == "__main__":
+    main()
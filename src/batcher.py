@@ -0,0 +1,302 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+import ee
+from dotenv import find_dotenv, load_dotenv
+
+from src.exception import log_e
+from src.traffic import recorder
+
+_ = load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+# property used to tag features of each caller inside a merged collection
+BATCH_PROPERTY = "jaltol_batch_index"
+
+
+@dataclass()
+class BatchRequest:
+    """
+    Represents a single caller waiting on a batched reduction.
+
+    Attributes:
+        collection (ee.FeatureCollection): The caller's regions.
+        future (Future): Resolved with the caller's share of the result.
+
+    """
+
+    collection: ee.FeatureCollection
+    future: Future = field(default_factory=Future)
+
+
+@dataclass()
+class Batch:
+    """
+    Represents pending compatible reductions that are evaluated together.
+
+    Attributes:
+        image (ee.Image): The image to be reduced.
+        scale (float): The scale for reduction.
+        projection (ee.Projection): The projection for reduction.
+        reducer (ee.Reducer): The spatial reducer.
+        requests (List[BatchRequest]): The callers in the batch.
+        timer (Optional[threading.Timer]): Timer flushing the batch at window end.
+
+    """
+
+    image: ee.Image
+    scale: float
+    projection: ee.Projection
+    reducer: ee.Reducer
+    requests: List[BatchRequest] = field(default_factory=list)
+    timer: Optional[threading.Timer] = None
+
+
+class EEBatcher:
+    """
+    Micro-batcher merging compatible reduceRegions calls into one getInfo.
+
+    Calls over the same image (asset, date window and temporal reducer),
+    scale, projection and spatial reducer that arrive within the time window
+    are evaluated as a single reduceRegions over the combined regions, and the
+    per-feature results are split back to each caller.
+
+    Attributes:
+        window (float): Seconds to wait for compatible calls.
+        max_size (int): Maximum number of calls in a batch.
+        timeout (float): Seconds a caller waits for its result.
+
+    """
+
+    def __init__(self, window: float, max_size: int, timeout: float = 300) -> None:
+        self.window = window
+        self.max_size = max_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending: Dict[Tuple, Batch] = {}
+
+    @classmethod
+    def from_env(cls) -> "EEBatcher":
+        """
+        Creates an EEBatcher configured from the environment.
+
+        Returns:
+            EEBatcher: The batcher, disabled when EE_BATCH_WINDOW_MS is 0.
+
+        """
+        window_ms = float(os.getenv("EE_BATCH_WINDOW_MS", 50))
+        max_size = int(os.getenv("EE_BATCH_MAX_SIZE", 16))
+        timeout = float(os.getenv("EE_BATCH_TIMEOUT", 300))
+        return cls(window=window_ms / 1000, max_size=max_size, timeout=timeout)
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether calls are queued and merged.
+
+        Returns:
+            bool: True if the time window and the maximum batch size allow merging.
+
+        """
+        return self.window > 0 and self.max_size > 1
+
+    def batch_key(
+        self,
+        image: ee.Image,
+        scale: float,
+        projection: ee.Projection,
+        spatial_reducer: str,
+        image_key: Optional[Hashable] = None,
+    ) -> Tuple:
+        """
+        Builds the key identifying compatible reductions.
+
+        Serializing the image walks its whole graph, so callers reducing
+        known images pass a cheap image key instead.
+
+        Args:
+            image (ee.Image): The image to be reduced.
+            scale (float): The scale for reduction.
+            projection (ee.Projection): The projection for reduction.
+            spatial_reducer (str): The spatial reducer name.
+            image_key (Optional[Hashable]): Identifies the image and its projection.
+
+        Returns:
+            Tuple: The computation parameters.
+
+        """
+        if image_key is not None:
+            return (image_key, scale, spatial_reducer)
+        return (
+            ee.Image(image).serialize(),
+            scale,
+            projection.serialize(),
+            spatial_reducer,
+        )
+
+    def submit(
+        self,
+        image: ee.Image,
+        geometry: Union[ee.Geometry, ee.Feature, ee.FeatureCollection],
+        scale: float,
+        projection: ee.Projection,
+        spatial_reducer: str,
+        reducer: ee.Reducer,
+        image_key: Optional[Hashable] = None,
+    ) -> Future:
+        """
+        Queues a reduction, merging it with pending compatible reductions.
+
+        Args:
+            image (ee.Image): The image to be reduced.
+            geometry (Union[ee.Geometry, ee.Feature, ee.FeatureCollection]): The region geometry.
+            scale (float): The scale for reduction.
+            projection (ee.Projection): The projection for reduction.
+            spatial_reducer (str): The spatial reducer name.
+            reducer (ee.Reducer): The spatial reducer.
+            image_key (Optional[Hashable]): Identifies the image and its projection.
+
+        Returns:
+            Future: Resolved with the reduced FeatureCollection as a dictionary.
+
+        """
+        request = BatchRequest(ee.FeatureCollection(geometry))
+        batch = Batch(ee.Image(image), scale, projection, reducer, [request])
+        if not self.enabled:
+            self.execute(batch)
+            return request.future
+
+        key = self.batch_key(image, scale, projection, spatial_reducer, image_key)
+        full = None
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                batch.timer = threading.Timer(self.window, self.flush, (key, batch))
+                batch.timer.daemon = True
+                self._pending[key] = batch
+                batch.timer.start()
+            else:
+                pending.requests.append(request)
+                if len(pending.requests) >= self.max_size:
+                    full = self._pending.pop(key)
+        if full:
+            full.timer.cancel()
+            self.execute(full)
+        return request.future
+
+    def flush(self, key: Tuple, batch: Batch) -> None:
+        """
+        Evaluates a batch when its time window ends.
+
+        Args:
+            key (Tuple): The batch key.
+            batch (Batch): The batch the timer was started for.
+
+        """
+        with self._lock:
+            if self._pending.get(key) is not batch:
+                return
+            del self._pending[key]
+        self.execute(batch)
+
+    def execute(self, batch: Batch) -> None:
+        """
+        Evaluates a batch with a single getInfo and resolves its callers.
+
+        If a merged batch fails, its callers are evaluated individually, so
+        only the failing callers get the exception. If the result cannot be
+        split back, the unresolved callers get the exception.
+
+        Args:
+            batch (Batch): The batch to evaluate.
+
+        """
+        requests = batch.requests
+        try:
+            if len(requests) == 1:
+                collection = requests[0].collection
+            else:
+                collection = ee.FeatureCollection(
+                    [self.tag(r.collection, i) for i, r in enumerate(requests)]
+                ).flatten()
+            # captured per caller by the traffic recorder, not as merged request
+            with recorder.untracked():
+                result = batch.image.reduceRegions(
+                    collection=collection,
+                    reducer=batch.reducer,
+                    scale=batch.scale,
+                    crs=batch.projection,
+                ).getInfo()
+        except Exception as e:
+            logger.exception(log_e())
+            if len(requests) == 1:
+                requests[0].future.set_exception(e)
+                return
+            # a single failing caller must not fail the others of the batch
+            for request in requests:
+                self.execute(
+                    Batch(
+                        batch.image,
+                        batch.scale,
+                        batch.projection,
+                        batch.reducer,
+                        [request],
+                    )
+                )
+            return
+
+        logger.debug(f"evaluated {len(requests)} reduction(s) in one request")
+        # runs on the timer thread, every caller must be resolved even on errors
+        try:
+            if len(requests) == 1:
+                requests[0].future.set_result(result)
+                return
+            for index, features in self.split(result, len(requests)).items():
+                requests[index].future.set_result({**result, "features": features})
+        except Exception as e:
+            logger.exception(log_e())
+            for request in requests:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    @staticmethod
+    def tag(collection: ee.FeatureCollection, index: int) -> ee.FeatureCollection:
+        """
+        Tags every feature of a caller's collection with its batch index.
+
+        Args:
+            collection (ee.FeatureCollection): The caller's regions.
+            index (int): The caller's position in the batch.
+
+        Returns:
+            ee.FeatureCollection: The tagged collection.
+
+        """
+        return collection.map(lambda feature: feature.set(BATCH_PROPERTY, index))
+
+    @staticmethod
+    def split(result: Dict[str, Any], size: int) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Splits the merged features back by batch index.
+
+        Args:
+            result (Dict[str, Any]): The merged FeatureCollection dictionary.
+            size (int): The number of callers in the batch.
+
+        Returns:
+            Dict[int, List[Dict[str, Any]]]: The features of each caller.
+
+        """
+        features = {index: [] for index in range(size)}
+        for feature in result["features"]:
+            index = feature["properties"].pop(BATCH_PROPERTY)
+            features[index].append(feature)
+        return features
+
+
+ee_batcher = EEBatcher.from_env()
@@ -0,0 +1,261 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, Optional, Tuple
+from uuid import uuid4
+
+from dotenv import find_dotenv, load_dotenv
+from langchain.callbacks.base import BaseCallbackHandler
+from starlette.websockets import WebSocket
+
+_ = load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    history TEXT,
+    version INTEGER,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated);
+"""
+
+
+class ProgressCallback(BaseCallbackHandler):
+    """
+    Callback pushing the progress of the agent to the WebSocket.
+
+    """
+
+    def __init__(self, websocket: WebSocket, loop: asyncio.AbstractEventLoop) -> None:
+        self.websocket = websocket
+        self.loop = loop
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs) -> None:
+        """
+        Sends the name of the tool being run to the WebSocket.
+
+        Args:
+            serialized (Dict[str, Any]): The serialized tool.
+            input_str (str): The tool input.
+
+        """
+        text = f"Calculating with {serialized.get('name')}..."
+        asyncio.run_coroutine_threadsafe(
+            self.websocket.send_json({"type": "progress", "text": text}), self.loop
+        )
+
+
+class ConversationChannel:
+    """
+    State of the WebSocket conversations.
+
+    Limits the open connections of the worker and checkpoints the memory of
+    conversations held over WebSocket, as their session cookie cannot be
+    updated. Checkpoints are kept in a SQLite file shared by the workers of
+    the host, so a conversation survives restarts and reconnects to another
+    worker. The /jaltol/ route takes over a checkpointed conversation and
+    moves it back to the cookie.
+
+    Attributes:
+        max_connections (int): Maximum open connections of the worker.
+        idle_timeout (float): Seconds a connection may wait for a message.
+        checkpoint_turns (int): Turns between checkpoints of the memory.
+        store_size (int): Maximum conversations checkpointed.
+        store_path (str): The path to the SQLite database of checkpoints.
+
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        idle_timeout: float = 300,
+        checkpoint_turns: int = 5,
+        store_size: int = 1000,
+        store_path: str = "data/conversations.sqlite3",
+    ) -> None:
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.checkpoint_turns = checkpoint_turns
+        self.store_size = store_size
+        self.store_path = store_path
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._schema = False
+
+    @classmethod
+    def from_env(cls) -> "ConversationChannel":
+        """
+        Creates a ConversationChannel configured from the environment.
+
+        Returns:
+            ConversationChannel: The channel.
+
+        """
+        return cls(
+            max_connections=int(os.getenv("WS_MAX_CONNECTIONS", 100)),
+            idle_timeout=float(os.getenv("WS_IDLE_TIMEOUT", 300)),
+            checkpoint_turns=int(os.getenv("WS_CHECKPOINT_TURNS", 5)),
+            store_size=int(os.getenv("WS_STORE_SIZE", 1000)),
+            store_path=os.getenv("WS_STORE_PATH", "data/conversations.sqlite3"),
+        )
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the checkpoint store, creating it if needed.
+
+        Returns:
+            sqlite3.Connection: The connection.
+
+        """
+        if not self._schema:
+            os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        connection = sqlite3.connect(self.store_path, timeout=30)
+        if not self._schema:
+            connection.executescript(SCHEMA)
+            self._schema = True
+        return connection
+
+    def acquire(self) -> bool:
+        """
+        Reserves a connection of the worker.
+
+        Returns:
+            bool: False if the worker is at its connection limit.
+
+        """
+        with self._lock:
+            if self.connections >= self.max_connections:
+                return False
+            self.connections += 1
+            return True
+
+    def release(self) -> None:
+        """
+        Frees a connection of the worker.
+
+        """
+        with self._lock:
+            self.connections -= 1
+
+    @staticmethod
+    def conversation_id(session: Dict[str, Any]) -> str:
+        """
+        Returns the id of the conversation of a session, creating it if needed.
+
+        Args:
+            session (Dict[str, Any]): The session of the request.
+
+        Returns:
+            str: The conversation id.
+
+        """
+        return session.setdefault("conversation_id", uuid4().hex)
+
+    def history(self, conversation_id: str) -> Tuple[Optional[str], int]:
+        """
+        Returns the checkpointed memory of a conversation and its version.
+
+        Args:
+            conversation_id (str): The conversation id.
+
+        Returns:
+            Tuple[Optional[str], int]: Serialized memory, or None if not
+                checkpointed, and the version to checkpoint the next memory on.
+
+        """
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT history, version FROM conversations WHERE id = ?",
+                (conversation_id,),
+            ).fetchone()
+        return (row[0], row[1]) if row else (None, 0)
+
+    def pop(self, conversation_id: str) -> Optional[str]:
+        """
+        Takes over the checkpointed memory of a conversation.
+
+        The memory is removed and the version is bumped, so a WebSocket still
+        running on the previous version cannot checkpoint over the turns
+        taken elsewhere.
+
+        Args:
+            conversation_id (str): The conversation id.
+
+        Returns:
+            Optional[str]: Serialized memory, or None if not checkpointed.
+
+        """
+        with closing(self.connect()) as connection, connection:
+            # take the write lock first, so only one worker gets the memory
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT history FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            connection.execute(
+                "INSERT INTO conversations VALUES (?, NULL, 1, ?) ON CONFLICT (id) "
+                "DO UPDATE SET history = NULL, version = version + 1, "
+                "updated = excluded.updated",
+                (conversation_id, time.time()),
+            )
+            self.evict(connection)
+        return row[0] if row else None
+
+    def checkpoint(
+        self, conversation_id: str, history: Optional[str], version: int
+    ) -> Optional[int]:
+        """
+        Checkpoints the memory of a conversation, evicting the oldest ones.
+
+        The memory is only written if the conversation is still on the
+        version it was resumed or last checkpointed on.
+
+        Args:
+            conversation_id (str): The conversation id.
+            history (Optional[str]): Serialized memory.
+            version (int): The version the memory is based on.
+
+        Returns:
+            Optional[int]: The new version, or None if the conversation has
+                been taken over since.
+
+        """
+        if history is None:
+            return version
+        with closing(self.connect()) as connection, connection:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT version FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if (row[0] if row else 0) != version:
+                logger.info(f"conversation {conversation_id} moved on, skipped")
+                return None
+            connection.execute(
+                "INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)",
+                (conversation_id, history, version + 1, time.time()),
+            )
+            self.evict(connection)
+        logger.debug(f"checkpointed conversation {conversation_id}")
+        return version + 1
+
+    def evict(self, connection: sqlite3.Connection) -> None:
+        """
+        Removes the least recently updated conversations beyond the store size.
+
+        Args:
+            connection (sqlite3.Connection): The connection of the transaction.
+
+        """
+        connection.execute(
+            "DELETE FROM conversations WHERE id NOT IN (SELECT id FROM "
+            "conversations ORDER BY updated DESC, rowid DESC LIMIT ?)",
+            (self.store_size,),
+        )
+
+channel = ConversationChannel.from_env()
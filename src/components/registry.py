@@ -0,0 +1,401 @@
+import threading
+from dataclasses import dataclass
+from typing import ClassVar, Dict, List, Optional, Tuple, Union
+
+import ee
+from langchain.tools import BaseTool
+
+from src.admin import LEVELS, admin_store
+from src.prompt import admin_year_desc, single_year_desc
+from src.utils import EEAsset, JaltolBaseClass, LocationDetails
+
+TEMPORAL_STEPS = ("year",)
+TEMPORAL_SPANS = ("hydrological", "calendar")
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Declarative description of a dataset served by JaltolAI.
+
+    Attributes:
+        name (str): The dataset name, used for the tool names.
+        topic (str): The topic text given to the agent.
+        asset_path (str): The path to the Earth Engine ImageCollection.
+        band (Union[str, int]): The band name or index to compute on (default: 0).
+        units (str): The units of the computed value (default: "mm").
+        temporal_reducer (str): The default temporal reducer (default: "sum").
+        spatial_reducer (str): The default spatial reducer (default: "mean").
+        temporal_steps (Tuple[str, ...]): The supported temporal steps (default: ("year",)).
+        temporal_spans (Tuple[str, ...]): The supported temporal spans (default: ("hydrological",)).
+
+    """
+
+    name: str
+    topic: str
+    asset_path: str
+    band: Union[str, int] = 0
+    units: str = "mm"
+    temporal_reducer: str = "sum"
+    spatial_reducer: str = "mean"
+    temporal_steps: Tuple[str, ...] = ("year",)
+    temporal_spans: Tuple[str, ...] = ("hydrological",)
+
+    def __post_init__(self):
+        if unsupported := set(self.temporal_steps) - set(TEMPORAL_STEPS):
+            raise ValueError(f"{self.name}: unsupported temporal steps {unsupported}")
+        if unsupported := set(self.temporal_spans) - set(TEMPORAL_SPANS):
+            raise ValueError(f"{self.name}: unsupported temporal spans {unsupported}")
+
+
+class DatasetComputation(JaltolBaseClass):
+    """
+    Precompiled computation for a registered dataset.
+
+    The asset metadata and the parameterized computation graph are built once
+    per worker, and the image of each date window once per worker, so a call
+    only substitutes the location.
+
+    Attributes:
+        dataset (Dataset): The dataset computed.
+
+    """
+
+    def __init__(self, dataset: Dataset) -> None:
+        self.dataset = dataset
+        self._asset: Optional[EEAsset] = None
+        self._template: Optional[ee.Function] = None
+        self._images: Dict[Tuple[int, str, str], ee.Image] = {}
+        # separate locks, building the template reads the asset
+        self._asset_lock = threading.Lock()
+        self._template_lock = threading.Lock()
+
+    @property
+    def asset(self) -> EEAsset:
+        """
+        Returns the EEAsset of the dataset, fetching its metadata on first use.
+
+        Returns:
+            EEAsset: The EEAsset of the dataset.
+
+        """
+        if self._asset is None:
+            with self._asset_lock:
+                if self._asset is None:
+                    self._asset = EEAsset(self.dataset.asset_path)
+        return self._asset
+
+    @property
+    def template(self) -> ee.Function:
+        """
+        Returns the computation graph taking start and end dates as parameters.
+
+        Returns:
+            ee.Function: The temporally reduced image as a function of the dates.
+
+        """
+        if self._template is None:
+            with self._template_lock:
+                if self._template is None:
+                    self._template = self.create_template()
+        return self._template
+
+    def create_template(self) -> ee.Function:
+        """
+        Creates the parameterized computation graph of the dataset.
+
+        Returns:
+            ee.Function: The temporally reduced image as a function of the dates.
+
+        """
+        image_col = self.asset.ee_col.select([self.dataset.band])
+
+        def compute(start: ee.Date, end: ee.Date) -> ee.Image:
+            filtered = self.filter_collection(image_col, start, end)
+            return self.temporal_reduction(filtered, self.dataset.temporal_reducer)
+
+        return ee.CustomFunction.create(compute, "Image", ["Date", "Date"])
+
+    def image(
+        self,
+        year: int,
+        temporal_span: str = "hydrological",
+        temporal_step: str = "year",
+    ) -> ee.Image:
+        """
+        Returns the temporally reduced image of a year, building it on first use.
+
+        Args:
+            year (int): The year.
+            temporal_span (str): The temporal span (default: "hydrological").
+            temporal_step (str): The temporal step (default: "year").
+
+        Returns:
+            ee.Image: The temporally reduced image.
+
+        """
+        key = (year, temporal_span, temporal_step)
+        image = self._images.get(key)
+        if image is None:
+            start, end = self.date_gen(year, temporal_span, temporal_step)
+            # building twice on a race is harmless, the images are equal
+            image = self._images.setdefault(
+                key, ee.Image(self.template.call(start, end))
+            )
+        return image
+
+    def handler(
+        self,
+        location: Union[ee.Geometry, ee.Feature, ee.FeatureCollection],
+        year: int,
+        temporal_span: str = "hydrological",
+        temporal_step: str = "year",
+    ) -> float:
+        """
+        Calculate the value of the dataset for a location.
+
+        Args:
+            location (Union[ee.Geometry, ee.Feature, ee.FeatureCollection]): The location geometry.
+            year (int): The year.
+            temporal_span (str): The temporal span (default: "hydrological").
+            temporal_step (str): The temporal step (default: "year").
+
+        Returns:
+            float: The computed value.
+
+        """
+        reduced_dict = self.reduce_regions(
+            self.image(year, temporal_span, temporal_step),
+            location,
+            self.asset.scale,
+            self.asset.projection,
+            self.dataset.spatial_reducer,
+            image_key=(self.dataset.name, year, temporal_span, temporal_step),
+        )
+        value = reduced_dict["features"][0]["properties"][self.dataset.spatial_reducer]
+        return round(value, 2)
+
+
+class DatasetSingleYearTool(BaseTool):
+    """
+    Base tool for calculating a dataset for a specific village in a single year.
+
+    Subclasses are generated by the DatasetRegistry for each dataset and
+    temporal span.
+
+    Attributes:
+        computation (DatasetComputation): The computation of the dataset.
+        temporal_span (str): The temporal span of the year.
+
+    """
+
+    computation: ClassVar[DatasetComputation]
+    temporal_span: ClassVar[str]
+
+    def _run(self, location: str, year: int) -> Dict[str, Dict[str, Dict[int, float]]]:
+        """
+        Run the tool to calculate the dataset for a specific village in a single year.
+
+        Args:
+            location (str): The name of the location.
+            year (int): The year.
+
+        Returns:
+            Dict[str, Dict[str, Dict[int, float]]]: The calculated value.
+
+        """
+        ll = LocationDetails(location)
+        ee_location = ll.ee_obj()
+        value = self.computation.handler(ee_location, year, self.temporal_span)
+        return {self.computation.dataset.topic: {location: {year: value}}}
+
+    def _arun(self, location: str, year: int) -> None:
+        """
+        Asynchronous version of the run method (not implemented).
+
+        Args:
+            location (str): The name of the location.
+            year (int): The year.
+
+        Raises:
+            NotImplementedError: This tool does not support async.
+
+        """
+        raise NotImplementedError("This tool does not support async")
+
+
+class DatasetAdminYearTool(BaseTool):
+    """
+    Base tool for calculating a dataset for a block, district or state in a single year.
+
+    The values are rolled up from the precomputed village values of the admin
+    store. Subclasses are generated by the DatasetRegistry for each dataset
+    and temporal span.
+
+    Attributes:
+        computation (DatasetComputation): The computation of the dataset.
+        temporal_span (str): The temporal span of the year.
+
+    """
+
+    computation: ClassVar[DatasetComputation]
+    temporal_span: ClassVar[str]
+
+    def _run(
+        self,
+        location: str,
+        level: str,
+        year: int,
+        state: Optional[str] = None,
+        district: Optional[str] = None,
+    ) -> Union[str, Dict[str, Dict[str, Dict[int, float]]]]:
+        """
+        Run the tool to calculate the dataset for an admin region in a single year.
+
+        Args:
+            location (str): The name of the block, district or state.
+            level (str): One of block, district or state.
+            year (int): The year.
+            state (Optional[str]): The state of the block or district.
+            district (Optional[str]): The district of the block.
+
+        Returns:
+            Union[str, Dict[str, Dict[str, Dict[int, float]]]]: The calculated value, or why it is not available.
+
+        """
+        dataset = self.computation.dataset
+        level = level.strip().lower()
+        if level not in LEVELS:
+            return f"level should be one of {', '.join(LEVELS)}"
+        units = LocationDetails(location).admin_details(level, state, district)
+        if not units:
+            return f"{dataset.topic} is not available for {level} {location}"
+        if len(units) > 1:
+            if level == "block":
+                found = "; ".join(
+                    f"{unit['district']} district, {unit['state']}" for unit in units
+                )
+                ask = "provide the district or state"
+            else:
+                found = "; ".join(unit["state"] for unit in units)
+                ask = "provide the state"
+            return f"{level} {location} is found in {found}, {ask}"
+        value = admin_store.rollup(units[0], dataset.name, self.temporal_span, year)
+        if value is None:
+            return f"{dataset.topic} is not available for {level} {location} in {year}"
+        return {dataset.topic: {location: {year: round(value, 2)}}}
+
+    def _arun(
+        self,
+        location: str,
+        level: str,
+        year: int,
+        state: Optional[str] = None,
+        district: Optional[str] = None,
+    ) -> None:
+        """
+        Asynchronous version of the run method (not implemented).
+
+        Args:
+            location (str): The name of the block, district or state.
+            level (str): One of block, district or state.
+            year (int): The year.
+            state (Optional[str]): The state of the block or district.
+            district (Optional[str]): The district of the block.
+
+        Raises:
+            NotImplementedError: This tool does not support async.
+
+        """
+        raise NotImplementedError("This tool does not support async")
+
+
+class DatasetRegistry:
+    """
+    Registry of the datasets, generating their computations and tools.
+
+    Attributes:
+        datasets (Dict[str, Dataset]): Mapping of dataset names to datasets.
+        computations (Dict[str, DatasetComputation]): Mapping of dataset names to computations.
+
+    """
+
+    def __init__(self) -> None:
+        self.datasets: Dict[str, Dataset] = {}
+        self.computations: Dict[str, DatasetComputation] = {}
+
+    def register(self, dataset: Dataset) -> Dataset:
+        """
+        Registers a dataset.
+
+        Args:
+            dataset (Dataset): The dataset to register.
+
+        Returns:
+            Dataset: The registered dataset.
+
+        Raises:
+            ValueError: If a dataset with the same name is already registered.
+
+        """
+        if dataset.name in self.datasets:
+            raise ValueError(f"dataset {dataset.name} is already registered")
+        self.datasets[dataset.name] = dataset
+        self.computations[dataset.name] = DatasetComputation(dataset)
+        return dataset
+
+    @property
+    def topics(self) -> List[str]:
+        """
+        Returns the topics of the registered datasets.
+
+        Returns:
+            List[str]: The topic text of each dataset.
+
+        """
+        return [dataset.topic for dataset in self.datasets.values()]
+
+    def tools(self) -> List[BaseTool]:
+        """
+        Generates the tools of the registered datasets.
+
+        Returns:
+            List[BaseTool]: The village and admin region tools per dataset and supported temporal span.
+
+        """
+        tools = []
+        for dataset in self.datasets.values():
+            for temporal_span in dataset.temporal_spans:
+                tool_class = type(
+                    f"{dataset.name}Single{temporal_span.capitalize()}YearSingleVillage",
+                    (DatasetSingleYearTool,),
+                    {
+                        "name": f"{dataset.name}_{temporal_span.capitalize()}_Year_Single_Village",
+                        "description": single_year_desc.format(
+                            dataset.topic,
+                            "specific village",
+                            temporal_span,
+                            dataset.units,
+                        ),
+                        "computation": self.computations[dataset.name],
+                        "temporal_span": temporal_span,
+                    },
+                )
+                tools.append(tool_class())
+                admin_tool_class = type(
+                    f"{dataset.name}Single{temporal_span.capitalize()}YearAdminRegion",
+                    (DatasetAdminYearTool,),
+                    {
+                        "name": f"{dataset.name}_{temporal_span.capitalize()}_Year_Admin_Region",
+                        "description": admin_year_desc.format(
+                            dataset.topic, temporal_span, dataset.units
+                        ),
+                        "computation": self.computations[dataset.name],
+                        "temporal_span": temporal_span,
+                    },
+                )
+                tools.append(admin_tool_class())
+        return tools
+
+
+registry = DatasetRegistry()
@@ -0,0 +1,410 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httplib2
+import requests
+from dotenv import find_dotenv, load_dotenv
+from geopy.adapters import RequestsAdapter
+from requests.adapters import HTTPAdapter
+from requests.utils import select_proxy
+
+_ = load_dotenv(find_dotenv())
+
+
+class SharedSession(requests.Session):
+    """
+    Session shared by all the outbound clients of a worker.
+
+    Clients like geopy and openai close their session when they are done or
+    when it gets old, which would drop the pooled connections of every client,
+    so close() keeps the pool and shutdown() releases it.
+
+    """
+
+    def __init__(self, pool: "HttpPool") -> None:
+        super().__init__()
+        self.pool = pool
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Sends a request over the pool, tracking its connection usage.
+
+        Requests sent by another mounted adapter, like the traffic replay
+        adapter, do not use the pool and are not tracked.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            requests.Response: The response.
+
+        """
+        if self.get_adapter(request.url) is not self.pool.adapter:
+            return super().send(request, **kwargs)
+        with self.pool.track(request, **kwargs):
+            return super().send(request, **kwargs)
+
+    def close(self) -> None:
+        """
+        Keeps the connections open, the session is shared by all clients.
+
+        """
+
+    def shutdown(self) -> None:
+        """
+        Closes the connections of the pool.
+
+        """
+        super().close()
+
+
+class EEHttpTransport:
+    """
+    httplib2.Http compatible transport sending Earth Engine requests over the pool.
+
+    Attributes:
+        session (requests.Session): The pooled session.
+        timeout (Optional[float]): The request timeout in seconds.
+
+    """
+
+    # headers describing the raw body, which requests already decoded
+    SKIPPED_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+    def __init__(self, session: requests.Session, timeout: Optional[float]) -> None:
+        self.session = session
+        self.timeout = timeout
+        self.connections: Dict[str, Any] = {}
+
+    def request(
+        self,
+        uri: str,
+        method: str = "GET",
+        body: Optional[Any] = None,
+        headers: Optional[Dict[str, str]] = None,
+        redirections: int = httplib2.DEFAULT_MAX_REDIRECTS,
+        connection_type: Optional[Any] = None,
+        **kwargs,
+    ) -> Tuple[httplib2.Response, bytes]:
+        """
+        Sends a request the way httplib2.Http.request does.
+
+        Args:
+            uri (str): The request URI.
+            method (str): The HTTP method (default: "GET").
+            body (Optional[Any]): The request body.
+            headers (Optional[Dict[str, str]]): The request headers.
+            redirections (int): The maximum number of redirects to follow.
+            connection_type (Optional[Any]): Unused, kept for compatibility.
+
+        Returns:
+            Tuple[httplib2.Response, bytes]: The response and its content.
+
+        """
+        response = self.session.request(
+            method,
+            uri,
+            data=body,
+            headers=headers,
+            timeout=self.timeout,
+            allow_redirects=redirections > 0,
+        )
+        info = {
+            key.lower(): value
+            for key, value in response.headers.items()
+            if key.lower() not in self.SKIPPED_HEADERS
+        }
+        info["status"] = response.status_code
+        info["reason"] = response.reason
+        return httplib2.Response(info), response.content
+
+    def close(self) -> None:
+        """
+        Keeps the connections open, they belong to the shared session.
+
+        """
+
+
+class GeocoderSession:
+    """
+    View of the pooled session sending a geocoder's requests with its proxies.
+
+    Attributes:
+        session (requests.Session): The pooled session.
+        proxies (Dict[str, str]): The proxies of the geocoder.
+
+    """
+
+    def __init__(self, session: requests.Session, proxies: Dict[str, str]) -> None:
+        self.session = session
+        self.proxies = proxies
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request over the pooled session with the geocoder's proxies.
+
+        Args:
+            url (str): The URL.
+            **kwargs: The request arguments, like timeout and headers.
+
+        Returns:
+            requests.Response: The response.
+
+        """
+        return self.session.get(url, proxies=self.proxies, **kwargs)
+
+    def close(self) -> None:
+        """
+        Keeps the connections open, they belong to the shared session.
+
+        """
+
+
+class SharedSessionAdapter(RequestsAdapter):
+    """
+    geopy adapter sending geocoder requests over the pooled session.
+
+    The proxies of the geocoder are applied per request. A custom SSL context
+    cannot be applied to the pooled connections and is rejected.
+
+    """
+
+    def __init__(self, *, proxies=None, ssl_context=None, session: requests.Session):
+        if ssl_context is not None:
+            raise ValueError("ssl_context is not supported with the pooled session")
+        super().__init__(proxies=proxies, ssl_context=ssl_context)
+        proxies = self.session.proxies  # normalized by geopy
+        self.session.close()
+        self.session = GeocoderSession(session, proxies)
+
+
+class HttpPool:
+    """
+    Per-worker outbound HTTP layer with connection pooling and keep-alive.
+
+    The geocoder, the LLM client and the Earth Engine client all send their
+    requests through the same session, so connections are reused across
+    calls and requests.
+
+    Attributes:
+        adapter (HTTPAdapter): The pooled adapter.
+        session (SharedSession): The session shared by the clients.
+        pool_maxsize (int): The maximum connections kept per host.
+        timeout (Optional[float]): The request timeout in seconds of the
+            Earth Engine transport, geopy and openai pass their own timeouts.
+
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 20,
+        max_retries: int = 2,
+        timeout: Optional[float] = 60,
+    ) -> None:
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=max_retries,
+        )
+        self.pool_maxsize = pool_maxsize
+        self.timeout = timeout
+        self.session = SharedSession(self)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def from_env(cls) -> "HttpPool":
+        """
+        Creates an HttpPool configured from the environment.
+
+        Returns:
+            HttpPool: The pool.
+
+        """
+        timeout = float(os.getenv("HTTP_TIMEOUT", 60))
+        return cls(
+            pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", 10)),
+            pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", 20)),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES", 2)),
+            timeout=timeout or None,
+        )
+
+    def track(self, request: requests.PreparedRequest, **kwargs) -> "_Tracker":
+        """
+        Returns a context manager recording a request in the pool metrics.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+            **kwargs: The send arguments of the request, like proxies and verify.
+
+        Returns:
+            _Tracker: The context manager.
+
+        """
+        return _Tracker(self, request, **kwargs)
+
+    def connection_pool(
+        self,
+        request: requests.PreparedRequest,
+        proxies: Optional[Dict[str, str]] = None,
+        verify: Any = True,
+        cert: Optional[Any] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Returns the urllib3 connection pool the adapter sends a request with.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+            proxies (Optional[Dict[str, str]]): The proxies of the request.
+            verify (Any): The TLS verification of the request (default: True).
+            cert (Optional[Any]): The client certificate of the request.
+
+        Returns:
+            Any: The connection pool.
+
+        """
+        proxy = select_proxy(request.url, proxies)
+        manager = (
+            self.adapter.proxy_manager_for(proxy) if proxy else self.adapter.poolmanager
+        )
+        # requests >= 2.32 keys the pools by their TLS settings as well
+        if hasattr(self.adapter, "build_connection_pool_key_attributes"):
+            build_key = self.adapter.build_connection_pool_key_attributes
+            host_params, pool_kwargs = build_key(request, verify, cert)
+            return manager.connection_from_host(**host_params, pool_kwargs=pool_kwargs)
+        return manager.connection_from_url(request.url)
+
+    def ee_transport(self) -> EEHttpTransport:
+        """
+        Returns the transport to initialize Earth Engine with.
+
+        Returns:
+            EEHttpTransport: The httplib2 compatible transport.
+
+        """
+        return EEHttpTransport(self.session, self.timeout)
+
+    def geopy_adapter(self, *, proxies=None, ssl_context=None) -> SharedSessionAdapter:
+        """
+        Adapter factory for geopy geocoders.
+
+        Args:
+            proxies: The proxies of the geocoder.
+            ssl_context: The SSL context of the geocoder, must be None.
+
+        Returns:
+            SharedSessionAdapter: The adapter using the pooled session.
+
+        """
+        return SharedSessionAdapter(
+            proxies=proxies, ssl_context=ssl_context, session=self.session
+        )
+
+    def metrics(self) -> Dict[str, Dict[str, float]]:
+        """
+        Returns the utilization metrics of the pool per host.
+
+        Connection reuse savings are estimated from the average duration of
+        the requests that opened a new connection and those that reused one.
+
+        Returns:
+            Dict[str, Dict[str, float]]: The metrics for each host.
+
+        """
+        metrics = {}
+        with self._lock:
+            stats = {host: dict(values) for host, values in self._stats.items()}
+        for host, values in stats.items():
+            opened, reused = values["opened"], values["requests"] - values["opened"]
+            new_avg = values["opened_seconds"] / opened if opened else None
+            reused_avg = values["reused_seconds"] / reused if reused else None
+            metrics[host] = {
+                "requests": values["requests"],
+                "in_flight": values["in_flight"],
+                "max_in_flight": values["max_in_flight"],
+                "connections_opened": opened,
+                "connections_reused": reused,
+                "idle_connections": values["idle"],
+                "pool_maxsize": self.pool_maxsize,
+                "avg_seconds_new_connection": new_avg,
+                "avg_seconds_reused_connection": reused_avg,
+                "estimated_seconds_saved": (new_avg - reused_avg) * reused
+                if new_avg is not None and reused_avg is not None
+                else None,
+            }
+        return metrics
+
+    def shutdown(self) -> None:
+        """
+        Closes the pooled connections.
+
+        """
+        self.session.shutdown()
+
+
+class _Tracker:
+    """
+    Context manager recording a request in the HttpPool metrics.
+
+    """
+
+    def __init__(
+        self, pool: HttpPool, request: requests.PreparedRequest, **kwargs
+    ) -> None:
+        self.pool = pool
+        self.host = urlparse(request.url).netloc
+        self.connection_pool = pool.connection_pool(request, **kwargs)
+
+    def __enter__(self) -> None:
+        """
+        Counts the request as in flight and notes the open connections.
+
+        """
+        with self.pool._lock:
+            stats = self.pool._stats.setdefault(
+                self.host,
+                {
+                    "requests": 0,
+                    "in_flight": 0,
+                    "max_in_flight": 0,
+                    "opened": 0,
+                    "idle": 0,
+                    "opened_seconds": 0.0,
+                    "reused_seconds": 0.0,
+                },
+            )
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        self.opened = self.connection_pool.num_connections
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        """
+        Records the duration and whether the request opened a connection.
+
+        """
+        duration = time.perf_counter() - self.start
+        # approximate under concurrency, another request may open the connection
+        opened = self.connection_pool.num_connections > self.opened
+        queue = getattr(self.connection_pool.pool, "queue", [])
+        idle = sum(1 for conn in list(queue) if conn)
+        with self.pool._lock:
+            stats = self.pool._stats[self.host]
+            stats["requests"] += 1
+            stats["in_flight"] -= 1
+            stats["idle"] = idle
+            if opened:
+                stats["opened"] += 1
+                stats["opened_seconds"] += duration
+            else:
+                stats["reused_seconds"] += duration
+
+
+http_pool = HttpPool.from_env()
@@ -1,32 +1,40 @@
 import logging
 import os
 import pickle
-from typing import Optional
+from typing import List, Optional
 
+import openai
 from dotenv import find_dotenv, load_dotenv
 from langchain.agents import AgentExecutor, AgentType, initialize_agent
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.chains.conversation.memory import ConversationSummaryBufferMemory
 from langchain.chat_models import ChatOpenAI
 from langchain.memory.chat_message_histories.in_memory import ChatMessageHistory
 from langchain.prompts import MessagesPlaceholder
 from langchain.schema import messages_from_dict, messages_to_dict
 
-import src.components.evapotranspiration as evapotranspiration
-import src.components.precipitation as precipitaion
+import src.components.evapotranspiration  # noqa: F401
+import src.components.precipitation  # noqa: F401
+from src.components.registry import registry
+from src.connections import http_pool
 from src.exception import log_e
 from src.prompt import sys_msg
 
 _ = load_dotenv(find_dotenv())
 
-topics_list = [
-    precipitaion.topic,
-    evapotranspiration.topic,
-]
+# datasets register themselves on import
+topics_list = registry.topics
 
-tools_list = [
-    precipitaion.PrecipitationSingleHydrologicalYearSingleVillage(),
-    evapotranspiration.EvapotranspirationSingleHydrologicalYearSingleVillage(),
-]
+tools_list = registry.tools()
+
+# LLM requests use the pooled connections of the worker
+openai.requestssession = http_pool.session
+
+llm = ChatOpenAI(
+    openai_api_key=os.getenv("OPENAI_API_KEY"),
+    temperature=0,
+    model_name=os.getenv("LLM_MODEL"),
+)
 
 logger = logging.getLogger(__name__)
 
@@ -51,17 +59,15 @@ class AgentHandler:
 
     def create_llm(self) -> ChatOpenAI:
         """
-        Creates and returns a ChatOpenAI instance for language modeling.
+        Returns the ChatOpenAI instance for language modeling.
+
+        The instance is shared by the handlers of the worker.
 
         Returns:
             ChatOpenAI: The ChatOpenAI instance.
 
         """
-        return ChatOpenAI(
-            openai_api_key=os.getenv("OPENAI_API_KEY"),
-            temperature=0,
-            model_name=os.getenv("LLM_MODEL"),
-        )
+        return llm
 
     def create_memory(self) -> ConversationSummaryBufferMemory:
         """
@@ -162,19 +168,22 @@ class AgentHandler:
             logger.exception(log_e())
             return None
 
-    def query(self, input: str) -> str:
+    def query(
+        self, input: str, callbacks: Optional[List[BaseCallbackHandler]] = None
+    ) -> str:
         """
         Executes a query using the agent.
 
         Args:
             input (str): The user's input/query.
+            callbacks (Optional[List[BaseCallbackHandler]]): Callbacks for the run.
 
         Returns:
             str: The agent's response.
 
         """
         try:
-            return self.agent.run(input)
+            return self.agent.run(input, callbacks=callbacks)
         except Exception:
             logger.exception(log_e())
             return "Something went wrong, contact JaltolAI team."
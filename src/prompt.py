@@ -22,12 +22,26 @@ You have access to the following tools:
 
 # Tool Descriptions
 
-# format('topic', 'specific village', 'hydrological')
+# format('topic', 'specific village', 'hydrological', 'units')
 single_year_desc = """use this tool when you need to calculate {} for a \
-{} in given location and given {} year.
+{} in given location and given {} year. The output value is in {}.
 To use the tool, you must provide all of the following parameters,
 [location, year].
 location: location details like village, district and state name from the \
 user input
 year: year for which annual precipitation to be calculated
 """
+
+# format('topic', 'hydrological', 'units')
+admin_year_desc = """use this tool when you need to calculate {} for a \
+block, district or state in given location and given {} year. The output \
+value is in {}, aggregated over the villages of the region.
+To use the tool, you must provide all of the following parameters,
+[location, level, year] and district or state if the user gives them.
+location: name of the block, district or state from the user input, \
+without the words block, district or state
+level: one of block, district or state
+year: year for which the value is to be calculated
+state: state name of the block or district
+district: district name of the block
+"""
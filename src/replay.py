@@ -0,0 +1,195 @@
+"""
+Replays captured /jaltol/ traffic against the recorded upstream responses.
+
+usage: python -m src.replay logs/traffic.jsonl [--speed 1] [--upstream-latency]
+                                                [--report report.json]
+
+Run from the project root. Conversations are replayed concurrently, with the
+requests of a conversation sent in order, at the recorded pace divided by
+--speed (0 sends them as fast as possible).
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Returns a percentile of values by the nearest rank.
+
+    Args:
+        values (List[float]): The values.
+        q (float): The percentile as a fraction, like 0.95.
+
+    Returns:
+        float: The percentile.
+
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summary(latencies: List[float], span: float) -> Dict[str, float]:
+    """
+    Summarizes the latencies and throughput of a run.
+
+    Args:
+        latencies (List[float]): The request latencies in seconds.
+        span (float): The duration of the run in seconds.
+
+    Returns:
+        Dict[str, float]: The latency percentiles and throughput.
+
+    """
+    if not latencies:
+        return {"requests": 0}
+    return {
+        "requests": len(latencies),
+        "mean": round(statistics.mean(latencies), 4),
+        "p50": round(percentile(latencies, 0.5), 4),
+        "p95": round(percentile(latencies, 0.95), 4),
+        "max": round(max(latencies), 4),
+        "throughput": round(len(latencies) / span, 4) if span else None,
+    }
+
+
+def replay(
+    app: Any, records: List[Dict[str, Any]], speed: float
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Sends the recorded requests to the app.
+
+    Args:
+        app (Any): The JaltolAI app, imported in replay mode.
+        records (List[Dict[str, Any]]): The recorded requests, ordered by time.
+        speed (float): The pace multiplier, 0 for no delays.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The latency and status of each request.
+
+    """
+    from starlette.testclient import TestClient
+
+    from src.traffic import REPLAY_HEADER
+
+    conversations = defaultdict(list)
+    for record in records:
+        conversations[record.get("sid") or record["id"]].append(record)
+
+    results = {}
+    origin, start = records[0]["t"], time.perf_counter()
+
+    def run(conversation: List[Dict[str, Any]]) -> None:
+        client = TestClient(app)
+        for record in conversation:
+            if speed:
+                delay = (record["t"] - origin) / speed - (time.perf_counter() - start)
+                time.sleep(max(0, delay))
+            sent = time.perf_counter()
+            response = client.post(
+                "/jaltol/",
+                json={"user": record["in"]},
+                headers={REPLAY_HEADER: record["id"]},
+            )
+            results[record["id"]] = {
+                "latency": time.perf_counter() - sent,
+                "status": response.status_code,
+            }
+
+    threads = [threading.Thread(target=run, args=(c,)) for c in conversations.values()]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def report(
+    records: List[Dict[str, Any]],
+    results: Dict[str, Dict[str, Any]],
+    replayed: Dict[str, Dict[str, Any]],
+    span: float,
+) -> Dict[str, Any]:
+    """
+    Compares the replay with the recorded traffic.
+
+    Both are compared on the duration of the query measured by the traffic
+    recorder. The round trip through the test client, which also includes
+    building the agent and the session handling, is reported separately.
+
+    Args:
+        records (List[Dict[str, Any]]): The recorded requests.
+        results (Dict[str, Dict[str, Any]]): The latency and status of each replayed request.
+        replayed (Dict[str, Dict[str, Any]]): The requests as seen by the app while replaying.
+        span (float): The duration of the replay in seconds.
+
+    Returns:
+        Dict[str, Any]: The recorded, replayed and round trip summaries.
+
+    """
+    recorded_span = max(r["t"] + r["dur"] for r in records) - records[0]["t"]
+    tool_mismatches = [
+        r["id"]
+        for r in records
+        if [t["n"] for t in r["tools"]]
+        != [t["n"] for t in replayed.get(r["id"], {}).get("tools", [])]
+    ]
+    return {
+        "recorded": summary([r["dur"] for r in records], recorded_span),
+        "replayed": summary([r["dur"] for r in replayed.values()], span),
+        "replayed_round_trip": summary(
+            [r["latency"] for r in results.values()], span
+        ),
+        "errors": sum(1 for r in results.values() if r["status"] != 200),
+        "tool_mismatches": tool_mismatches,
+    }
+
+
+def main() -> None:
+    """
+    Replays a traffic file and prints the report as JSON.
+
+    """
+    parser = argparse.ArgumentParser(description="Replay captured JaltolAI traffic.")
+    parser.add_argument("path", help="traffic file captured with JALTOL_TRAFFIC_MODE=capture")
+    parser.add_argument("--speed", type=float, default=1, help="pace multiplier, 0 for no delays")
+    parser.add_argument(
+        "--upstream-latency",
+        action="store_true",
+        help="sleep the recorded upstream durations, scaled by the speed",
+    )
+    parser.add_argument("--report", help="file to write the JSON report to")
+    args = parser.parse_args()
+
+    # configured before the app is imported, nothing goes to the network
+    os.environ["JALTOL_TRAFFIC_MODE"] = "replay"
+    os.environ["JALTOL_TRAFFIC_FILE"] = args.path
+    latency = (1 / args.speed if args.speed else 0) if args.upstream_latency else 0
+    os.environ["JALTOL_TRAFFIC_LATENCY"] = str(latency)
+    os.environ.setdefault("OPENAI_API_KEY", "replay")
+    os.environ.setdefault("SESSION_KEY", "replay")
+
+    from main import app
+    from src.traffic import recorder
+
+    records = sorted(recorder.records.values(), key=lambda record: record["t"])
+    if not records:
+        raise SystemExit(f"no requests recorded in {args.path}")
+
+    start = time.perf_counter()
+    results = replay(app, records, args.speed)
+    output = report(records, results, recorder.replayed, time.perf_counter() - start)
+
+    print(json.dumps(output, indent=2))
+    if args.report:
+        with open(args.report, "w") as file:
+            json.dump(output, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,603 @@
+import base64
+import gzip
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from uuid import uuid4
+
+import requests
+from dotenv import find_dotenv, load_dotenv
+from langchain.callbacks.base import BaseCallbackHandler
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from src.connections import HttpPool
+from src.exception import log_e
+
+_ = load_dotenv(find_dotenv())
+
+logger = logging.getLogger(__name__)
+
+# header carrying the recorded request id while replaying
+REPLAY_HEADER = "X-Jaltol-Replay-Id"
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(
+    r"(?<![\w.+])(?:"
+    r"\+\d[\d\s().-]{8,}\d"  # international
+    r"|(?:(?:\+?91|0)[\s.-]?)?[6-9]\d{2}(?:[\s.-]?\d){7}"  # mobile, in any grouping
+    r"|0\d{2,4}[\s.-]?\d{3,4}[\s.-]?\d{4}"  # landline with STD code
+    r")(?!\d)"
+)
+SECRET_KEYS = {"access_token", "id_token", "refresh_token"}
+
+SERVICES = {
+    "nominatim.openstreetmap.org": "geocoder",
+    "api.openai.com": "llm",
+}
+
+
+def scrub(text: str) -> str:
+    """
+    Removes personal information like emails and phone numbers from a text.
+
+    Args:
+        text (str): The text to scrub.
+
+    Returns:
+        str: The scrubbed text.
+
+    """
+    return PHONE_RE.sub("[PHONE]", EMAIL_RE.sub("[EMAIL]", text))
+
+
+def scrub_json(value: Any) -> Any:
+    """
+    Scrubs the strings of a JSON value and redacts its secrets.
+
+    Args:
+        value (Any): The decoded JSON value.
+
+    Returns:
+        Any: The scrubbed value.
+
+    """
+    if isinstance(value, dict):
+        return {
+            k: "REDACTED" if k in SECRET_KEYS else scrub_json(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, list):
+        return [scrub_json(v) for v in value]
+    if isinstance(value, str):
+        return scrub(value)
+    return value
+
+
+def encode_body(content: bytes) -> Dict[str, str]:
+    """
+    Encodes a response body for the capture file, scrubbing it if it is text.
+
+    Args:
+        content (bytes): The response body.
+
+    Returns:
+        Dict[str, str]: The body as "b" for text or "b64" for binary content.
+
+    """
+    try:
+        text = content.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(content).decode("ascii")}
+    try:
+        return {"b": dumps(scrub_json(json.loads(text)))}
+    except ValueError:
+        return {"b": scrub(text)}
+
+
+def decode_body(entry: Dict[str, Any]) -> bytes:
+    """
+    Decodes a response body of the capture file.
+
+    Args:
+        entry (Dict[str, Any]): The recorded upstream call.
+
+    Returns:
+        bytes: The response body.
+
+    """
+    if "b64" in entry:
+        return base64.b64decode(entry["b64"])
+    return entry.get("b", "").encode("utf-8")
+
+
+def dumps(value: Any) -> str:
+    """
+    Serializes a value to compact JSON.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        str: The JSON without whitespace.
+
+    """
+    return json.dumps(value, separators=(",", ":"), default=str)
+
+
+def service_name(host: str) -> str:
+    """
+    Returns the upstream service of a host.
+
+    Args:
+        host (str): The host of the request.
+
+    Returns:
+        str: "geocoder", "llm", "ee" or the host itself.
+
+    """
+    if host in SERVICES:
+        return SERVICES[host]
+    return "ee" if host.endswith("googleapis.com") else host
+
+
+class Scope:
+    """
+    Upstream calls and tool invocations of a single request.
+
+    Attributes:
+        record (Dict[str, Any]): The captured request.
+        queues (Dict[Tuple[str, str], Deque[Dict[str, Any]]]): Recorded upstream calls to replay.
+
+    """
+
+    def __init__(self, record: Dict[str, Any]) -> None:
+        self.record = record
+        self.queues: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        for entry in record.get("up", []):
+            self.queues[(entry["s"], entry.get("u", ""))].append(entry)
+        self.record["up"] = []
+        self.record["tools"] = []
+
+
+class ToolCallback(BaseCallbackHandler):
+    """
+    Callback recording the tool invocations of the agent in a scope.
+
+    """
+
+    def __init__(self, scope: Scope) -> None:
+        self.scope = scope
+        self.started: List[Tuple[Dict[str, Any], float]] = []
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs) -> None:
+        """
+        Records the name, scrubbed arguments and start of a tool invocation.
+
+        Args:
+            serialized (Dict[str, Any]): The serialized tool.
+            input_str (str): The tool input.
+
+        """
+        tool = {"n": serialized.get("name"), "a": scrub(input_str)}
+        self.started.append((tool, time.perf_counter()))
+
+    def on_tool_end(self, output: str, **kwargs) -> None:
+        """
+        Records the duration and output size of a tool invocation.
+
+        Args:
+            output (str): The tool output.
+
+        """
+        self.end(size=len(str(output)))
+
+    def on_tool_error(self, error: BaseException, **kwargs) -> None:
+        """
+        Records the duration and error of a tool invocation.
+
+        Args:
+            error (BaseException): The tool error.
+
+        """
+        self.end(error=type(error).__name__)
+
+    def end(self, **values) -> None:
+        """
+        Adds the last started tool invocation to the scope.
+
+        Args:
+            **values: The output size as "size" or the error name as "error".
+
+        """
+        if not self.started:
+            return
+        tool, start = self.started.pop()
+        tool["d"] = round(time.perf_counter() - start, 4)
+        if "size" in values:
+            tool["o"] = values["size"]
+        if "error" in values:
+            tool["e"] = values["error"]
+        self.scope.record["tools"].append(tool)
+
+
+class TrafficRecorder:
+    """
+    Opt-in capture and replay of the traffic going through the /jaltol/ route.
+
+    Capture appends one compact JSON line per request to the traffic file with
+    the scrubbed input, the tool invocations and the upstream calls with their
+    durations, sizes and scrubbed responses. Replay serves the upstream calls
+    from the traffic file, so the app runs without network.
+
+    Attributes:
+        mode (str): "off", "capture" or "replay".
+        path (str): The traffic file, gzipped if it ends with ".gz".
+        latency (float): Scale of the recorded upstream durations slept while replaying.
+
+    """
+
+    def __init__(
+        self, mode: str = "off", path: str = "logs/traffic.jsonl", latency: float = 0
+    ) -> None:
+        if mode not in ("off", "capture", "replay"):
+            raise ValueError(f"unknown traffic mode {mode}")
+        self.mode = mode
+        self.path = path
+        self.latency = latency
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.replayed: Dict[str, Dict[str, Any]] = {}
+        self._background: Dict[Tuple[str, str], Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._fallback: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "TrafficRecorder":
+        """
+        Creates a TrafficRecorder configured from the environment.
+
+        Returns:
+            TrafficRecorder: The recorder, off unless JALTOL_TRAFFIC_MODE is set.
+
+        """
+        return cls(
+            mode=os.getenv("JALTOL_TRAFFIC_MODE", "off"),
+            path=os.getenv("JALTOL_TRAFFIC_FILE", "logs/traffic.jsonl"),
+            latency=float(os.getenv("JALTOL_TRAFFIC_LATENCY", 0)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """
+        Whether traffic is captured or replayed.
+
+        Returns:
+            bool: True unless the mode is "off".
+
+        """
+        return self.mode != "off"
+
+    @property
+    def scope(self) -> Optional[Scope]:
+        """
+        Returns the scope of the request handled by the current thread.
+
+        Returns:
+            Optional[Scope]: The scope, or None outside of a request.
+
+        """
+        return getattr(self._local, "scope", None)
+
+    def open(self, mode: str) -> IO[str]:
+        """
+        Opens the traffic file as text.
+
+        Args:
+            mode (str): "r" to read or "a" to append.
+
+        Returns:
+            IO[str]: The file, decompressed if it ends with ".gz".
+
+        """
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def install(self, pool: HttpPool) -> None:
+        """
+        Installs the capture or replay adapter on the pooled session.
+
+        Args:
+            pool (HttpPool): The outbound HTTP pool of the worker.
+
+        """
+        if self.mode == "capture":
+            adapter = CaptureAdapter(pool.adapter, self)
+        elif self.mode == "replay":
+            self.load()
+            adapter = ReplayAdapter(self)
+        else:
+            return
+        pool.session.mount("https://", adapter)
+        pool.session.mount("http://", adapter)
+        logger.info(f"traffic {self.mode} using {self.path}")
+
+    def load(self) -> None:
+        """
+        Loads the recorded requests and background upstream calls.
+
+        """
+        with self.open("r") as file:
+            for line in file:
+                entry = json.loads(line)
+                if entry["k"] == "req":
+                    self.records[entry["id"]] = entry
+                    for up in entry["up"]:
+                        if up["s"] == "ee" and "u" in up:
+                            self._fallback[(up["s"], up["u"])] = up
+                else:
+                    self._background[(entry["s"], entry.get("u", ""))].append(entry)
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        """
+        Appends an entry to the traffic file, logging the errors.
+
+        Args:
+            entry (Dict[str, Any]): The request or background upstream call.
+
+        """
+        # capture is diagnostics, failing to write must not fail the request
+        try:
+            line = dumps(entry) + "\n"
+            with self._lock, self.open("a") as file:
+                file.write(line)
+        except Exception:
+            logger.exception(log_e())
+
+    def handle(
+        self,
+        query: Callable[..., str],
+        input: str,
+        session_id: Optional[str] = None,
+        record_id: Optional[str] = None,
+        callbacks: Optional[List[BaseCallbackHandler]] = None,
+    ) -> str:
+        """
+        Runs a query within the capture or replay scope of the request.
+
+        Args:
+            query (Callable[..., str]): The query, called with the input and callbacks.
+            input (str): The user's input/query.
+            session_id (Optional[str]): The conversation id, while capturing.
+            record_id (Optional[str]): The recorded request id, while replaying.
+            callbacks (Optional[List[BaseCallbackHandler]]): Callbacks for the query.
+
+        Returns:
+            str: The response of the query.
+
+        """
+        if self.mode == "capture":
+            record = {"k": "req", "id": uuid4().hex, "sid": session_id, "t": time.time()}
+            record["in"] = scrub(input)
+        elif self.mode == "replay" and record_id in self.records:
+            record = dict(self.records[record_id])
+        else:
+            return query(input, callbacks=callbacks)
+
+        scope = Scope(record)
+        self._local.scope = scope
+        start = time.perf_counter()
+        try:
+            callbacks = [ToolCallback(scope), *(callbacks or [])]
+            response = query(input, callbacks=callbacks)
+        finally:
+            self._local.scope = None
+            record["dur"] = round(time.perf_counter() - start, 4)
+        record["out"] = len(response)
+        if self.mode == "capture":
+            self.write(record)
+        else:
+            self.replayed[record_id] = record
+        return response
+
+    def upstream(self, service: str, call: Callable[[], Any]) -> Any:
+        """
+        Runs an upstream call that is captured or replayed by its result.
+
+        Used for calls which do not map to a single HTTP request of the
+        request, like batched Earth Engine reductions.
+
+        Args:
+            service (str): The upstream service.
+            call (Callable[[], Any]): The upstream call.
+
+        Returns:
+            Any: The result of the call.
+
+        """
+        scope = self.scope
+        if scope is None:
+            return call()
+        if self.mode == "replay":
+            entry = self.next(scope, (service, ""))
+            return entry["r"]
+        start = time.perf_counter()
+        result = call()
+        size = len(dumps(result))
+        duration = round(time.perf_counter() - start, 4)
+        scope.record["up"].append({"s": service, "d": duration, "n": size, "r": result})
+        return result
+
+    @contextmanager
+    def untracked(self) -> Iterator[None]:
+        """
+        Excludes the HTTP requests of the block from the capture.
+
+        """
+        previous = getattr(self._local, "untracked", False)
+        self._local.untracked = True
+        try:
+            yield
+        finally:
+            self._local.untracked = previous
+
+    def exchange(
+        self,
+        request: requests.PreparedRequest,
+        response: requests.Response,
+        duration: float,
+    ) -> None:
+        """
+        Captures an HTTP exchange with an upstream service.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+            response (requests.Response): The response.
+            duration (float): The duration of the exchange in seconds.
+
+        """
+        if getattr(self._local, "untracked", False):
+            return
+        url = urlparse(request.url)
+        entry = {
+            "s": service_name(url.netloc),
+            "u": f"{request.method} {url.netloc}{url.path}",
+            "d": round(duration, 4),
+            "n": len(response.content),
+            "st": response.status_code,
+            "rs": response.reason,
+            "ct": response.headers.get("content-type", ""),
+            **encode_body(response.content),
+        }
+        if scope := self.scope:
+            scope.record["up"].append(entry)
+        else:
+            self.write({"k": "bg", **entry})
+
+    def next(self, scope: Optional[Scope], key: Tuple[str, str]) -> Dict[str, Any]:
+        """
+        Returns the next recorded upstream call, sleeping its scaled duration.
+
+        Earth Engine calls made once per worker, like fetching the asset
+        metadata, are recorded within the first request only, so those missing
+        from the replayed request are served from any other request.
+
+        Args:
+            scope (Optional[Scope]): The replayed request, None for background calls.
+            key (Tuple[str, str]): The service and request line of the call.
+
+        Returns:
+            Dict[str, Any]: The recorded upstream call.
+
+        Raises:
+            requests.ConnectionError: If there is no recorded call left.
+
+        """
+        queue = scope.queues[key] if scope else self._background[key]
+        with self._lock:
+            if queue:
+                entry = queue.popleft()
+            elif key in self._fallback:
+                entry = self._fallback[key]
+            else:
+                raise requests.ConnectionError(f"no recorded response for {key}")
+        if self.latency:
+            time.sleep(entry["d"] * self.latency)
+        if scope:
+            scope.record["up"].append({k: entry[k] for k in ("s", "d", "n")})
+        return entry
+
+
+class CaptureAdapter(BaseAdapter):
+    """
+    Adapter capturing the exchanges sent through the wrapped adapter.
+
+    """
+
+    def __init__(self, adapter: BaseAdapter, recorder: TrafficRecorder) -> None:
+        super().__init__()
+        self.adapter = adapter
+        self.recorder = recorder
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Sends a request with the wrapped adapter and captures the exchange.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            requests.Response: The response.
+
+        """
+        start = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        response.content  # read the body within the measured duration
+        try:
+            self.recorder.exchange(request, response, time.perf_counter() - start)
+        except Exception:
+            logger.exception(log_e())
+        return response
+
+    def close(self) -> None:
+        """
+        Closes the wrapped adapter.
+
+        """
+        self.adapter.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Adapter serving recorded responses instead of sending requests.
+
+    """
+
+    def __init__(self, recorder: TrafficRecorder) -> None:
+        super().__init__()
+        self.recorder = recorder
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        """
+        Serves the recorded response of a request.
+
+        Args:
+            request (requests.PreparedRequest): The request.
+
+        Returns:
+            requests.Response: The recorded response.
+
+        Raises:
+            requests.ConnectionError: If there is no recorded response left.
+
+        """
+        url = urlparse(request.url)
+        key = (service_name(url.netloc), f"{request.method} {url.netloc}{url.path}")
+        entry = self.recorder.next(self.recorder.scope, key)
+        response = requests.Response()
+        response.status_code = entry["st"]
+        response.reason = entry.get("rs", "")
+        response.headers = CaseInsensitiveDict({"content-type": entry["ct"]})
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response._content = decode_body(entry)
+        response._content_consumed = True
+        return response
+
+    def close(self) -> None:
+        """
+        Nothing to close, no connection is opened.
+
+        """
+
+
+recorder = TrafficRecorder.from_env()
@@ -1,12 +1,20 @@
 from dataclasses import dataclass, field
-from typing import Any, Dict, Generator, List, Tuple, Union
+from typing import Any, Dict, Generator, Hashable, List, Optional, Tuple, Union
 
 import ee
 from geopy.geocoders import Nominatim
 from pydantic import BaseModel
 
+from src.admin import admin_store
+from src.batcher import ee_batcher
+from src.connections import http_pool
+from src.traffic import recorder
+
 # Initialize GEE library
-ee.Initialize()
+ee.Initialize(http_transport=http_pool.ee_transport())
+
+# geocoder shared by the worker, its requests use the pooled connections
+geolocator = Nominatim(user_agent="JaltolAI", adapter_factory=http_pool.geopy_adapter)
 
 
 class JaltolInput(BaseModel):
@@ -53,7 +61,6 @@ class LocationDetails:
             Union[Tuple[float, float], None]: The latitude and longitude coordinates, or None if not found.
 
         """
-        geolocator = Nominatim(user_agent="JaltolAI")
         location = geolocator.geocode(self.location_name)
         return (location.latitude, location.longitude) if location else None
 
@@ -75,8 +82,22 @@ class LocationDetails:
         # return ee.Geometry.Point([longitude, latitude])
         return ee.FeatureCollection(ee.Geometry.Point([longitude, latitude]))
 
-    def admin_details(self):
-        pass
+    def admin_details(
+        self, level: str, state: Optional[str] = None, district: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Retrieves the admin units of a level matching the location name.
+
+        Args:
+            level (str): One of block, district or state.
+            state (Optional[str]): The state to look in.
+            district (Optional[str]): The district to look in.
+
+        Returns:
+            List[Dict[str, str]]: The level, state, district and block of each match.
+
+        """
+        return admin_store.resolve(self.location_name, level, state, district)
 
 
 @dataclass()
@@ -220,28 +241,37 @@ class JaltolBaseClass:
         scale: float,
         projection: ee.Projection,
         spatial_reducer: str = "mean",
+        image_key: Optional[Hashable] = None,
     ) -> Dict[str, List[Dict[str, Any]]]:
         """
         Reduces an Earth Engine image over regions defined by a geometry.
 
+        The reduction is queued in the EE micro-batcher, so compatible calls
+        from concurrent requests are evaluated with a single getInfo.
+
         Args:
             image (ee.Image): The Earth Engine image.
             geometry (Union[ee.Geometry, ee.Feature, ee.FeatureCollection]): The region geometry.
             scale (float): The scale for reduction.
             projection (ee.Projection): The projection for reduction.
             spatial_reducer (str, optional): The spatial reducer to use (default: "mean").
+            image_key (Optional[Hashable]): Identifies the image for batching, instead of serializing it.
 
         Returns:
             Dict[str, List[Dict[str, Any]]]: The reduced values for each region.
 
         """
-        return (
-            ee.Image(image)
-            .reduceRegions(
-                collection=geometry,
-                reducer=self.ee_reducer[spatial_reducer],
-                scale=scale,
-                crs=projection,
-            )
-            .getInfo()
-        )  # get_info['features'][0]['properties']
+
+        def reduce() -> Dict[str, List[Dict[str, Any]]]:
+            return ee_batcher.submit(
+                image,
+                geometry,
+                scale,
+                projection,
+                spatial_reducer,
+                self.ee_reducer[spatial_reducer],
+                image_key,
+            ).result(ee_batcher.timeout)  # get_info['features'][0]['properties']
+
+        # served from the recorded traffic while replaying
+        return recorder.upstream("ee", reduce)
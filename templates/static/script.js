@@ -1,5 +1,43 @@
 const api_route = 'http://127.0.0.1:8000/jaltol/'
+const ws_route = 'ws://127.0.0.1:8000/ws/jaltol/'
 var botResponse
+var socket = null
+// message sent on the socket and not answered yet
+var pendingMessage = null
+
+function connectSocket() {
+    // keep the conversation over WebSocket when available, else use api_route
+    if (!("WebSocket" in window)) {
+        return;
+    }
+    try {
+    var ws = new WebSocket(ws_route);
+    } catch(error) {
+    console.error('Error:', error);
+    return;
+    }
+    ws.onopen = function() {
+        socket = ws;
+    };
+    ws.onmessage = function(event) {
+        var data = JSON.parse(event.data);
+        if (data['type'] === 'progress') {
+            document.getElementById("processing-message").textContent = data['text'];
+        } else {
+            pendingMessage = null;
+            showBotMessage(data['text']);
+        }
+    };
+    ws.onclose = function() {
+        socket = null;
+        // the answer will not arrive on this socket, resend over api_route
+        if (pendingMessage !== null) {
+            var data = pendingMessage;
+            pendingMessage = null;
+            sendOverApi(data);
+        }
+    };
+}
 
 async function sendMessage() {
     var userInput = document.getElementById("user-input").value;
@@ -20,6 +58,17 @@ async function sendMessage() {
         user: userInput,
     };
 
+    // the answer is shown when it arrives on the socket
+    if (socket && socket.readyState === WebSocket.OPEN) {
+        pendingMessage = data;
+        socket.send(JSON.stringify(data));
+        return;
+    }
+
+    await sendOverApi(data);
+}
+
+async function sendOverApi(data) {
     // var botResponse = "This is the bot's response.";
     try {
     var response = await fetch(api_route, {
@@ -30,15 +79,26 @@ async function sendMessage() {
     body: JSON.stringify(data)
     });
 
-    var data = await response.json();
-    botResponse = data['text']
+    var output = await response.json();
+    botResponse = output['text']
     } catch(error) {
     // Handle any errors
     console.error('Error:', error);
+    botResponse = "Could not get a response, please try again.";
     }
 
+    showBotMessage(botResponse);
+
+    // reconnect for the next message, e.g. after an idle timeout
+    connectSocket();
+}
+
+function showBotMessage(message) {
+    var chatWindow = document.getElementById("chat-window");
+    var processingMessage = document.getElementById("processing-message");
+
     // Append bot response to the chat window
-    var botMessage = createMessageElement(botResponse, "bot");
+    var botMessage = createMessageElement(message, "bot");
     chatWindow.appendChild(botMessage);
 
     // Hide "Processing..." message
@@ -47,7 +107,6 @@ async function sendMessage() {
 
     // Scroll to the bottom of the chat window
     chatWindow.scrollTop = chatWindow.scrollHeight;
-
 }
 
 function createMessageElement(message, role) {
@@ -56,3 +115,5 @@ function createMessageElement(message, role) {
     messageElement.textContent = message;
     return messageElement;
 }
+
+connectSocket();
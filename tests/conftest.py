@@ -0,0 +1,59 @@
+import importlib
+import sys
+import types
+from unittest.mock import MagicMock
+
+# Earth Engine is always stubbed, importing src.utils initializes it over network
+sys.modules["ee"] = MagicMock()
+
+
+class _Stub:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __init_subclass__(cls, **kwargs):
+        pass
+
+    def mount(self, *args, **kwargs):
+        pass
+
+
+def _stub(name: str, **attributes) -> None:
+    """
+    Installs a stub module when the package is not installed.
+
+    Args:
+        name (str): The module name.
+        **attributes: The attributes of the stub module.
+
+    """
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        module = types.ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+_stub("dotenv", find_dotenv=lambda *args: "", load_dotenv=lambda *args: None)
+_stub("pydantic", BaseModel=_Stub)
+_stub("httplib2", DEFAULT_MAX_REDIRECTS=5, Response=dict)
+_stub(
+    "requests",
+    Session=_Stub,
+    PreparedRequest=_Stub,
+    Response=_Stub,
+    ConnectionError=ConnectionError,
+)
+_stub("requests.adapters", HTTPAdapter=_Stub, BaseAdapter=_Stub)
+_stub("requests.structures", CaseInsensitiveDict=dict)
+_stub("requests.utils", select_proxy=lambda url, proxies: None)
+_stub("geopy")
+_stub("geopy.geocoders", Nominatim=MagicMock())
+_stub("geopy.adapters", RequestsAdapter=_Stub)
+_stub("langchain")
+_stub("langchain.tools", BaseTool=_Stub)
+_stub("langchain.callbacks")
+_stub("langchain.callbacks.base", BaseCallbackHandler=_Stub)
+_stub("starlette")
+_stub("starlette.websockets", WebSocket=_Stub)
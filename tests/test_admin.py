@@ -0,0 +1,64 @@
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from src.admin import AdminStore
+
+VILLAGES = [
+    dict(zip(("id", "village", "block", "district", "state", "area"), village))
+    for village in (
+        ("1", "A", "Gubbi", "Tumkur", "Karnataka", 1.0),
+        ("2", "B", "Gubbi", "Tumkur", "Karnataka", 3.0),
+        ("3", "C", "Gubbi", "Nashik", "Maharashtra", 2.0),
+        ("4", "D", "Sinnar", "Nashik", "Maharashtra", 2.0),
+    )
+]
+VALUES = [("1", 100), ("2", 200), ("3", 50), ("4", 70)]
+
+
+@pytest.fixture
+def store(tmp_path) -> AdminStore:
+    store = AdminStore(str(tmp_path / "admin.sqlite3"))
+    store.add_villages(VILLAGES)
+    store.add_values("Rain", "hydrological", 2020, VALUES)
+    store.rebuild_rollups("Rain", "hydrological")
+    return store
+
+
+def test_rollup_is_area_weighted(store):
+    (unit,) = store.resolve("Tumkur district", "district")
+
+    assert store.rollup(unit, "Rain", "hydrological", 2020) == pytest.approx(175)
+
+
+def test_resolve_disambiguates_by_district(store):
+    assert len(store.resolve("gubbi", "block")) == 2
+
+    (unit,) = store.resolve("gubbi", "block", district="Nashik district")
+
+    assert unit["state"] == "Maharashtra"
+    assert store.rollup(unit, "Rain", "hydrological", 2020) == pytest.approx(50)
+
+
+def test_resolve_disambiguates_by_state(store):
+    (unit,) = store.resolve("Gubbi", "block", state="karnataka")
+
+    assert unit["district"] == "Tumkur"
+
+
+def test_lookups_open_the_store_read_only(store):
+    reader = AdminStore(store.path)
+
+    assert reader.resolve("Gubbi", "block", state="Karnataka")
+    with closing(reader.connect()) as connection:
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("DELETE FROM rollups")
+    assert not reader._schema
+
+
+def test_missing_store_is_not_created(tmp_path):
+    reader = AdminStore(str(tmp_path / "missing" / "admin.sqlite3"))
+
+    assert reader.resolve("Gubbi", "block") == []
+    assert not (tmp_path / "missing").exists()
@@ -0,0 +1,121 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src import batcher
+from src.batcher import BATCH_PROPERTY, EEBatcher
+
+
+class FakeCollection:
+    def __init__(self, value):
+        self.value = value
+
+    def map(self, function):
+        feature = SimpleNamespace(set=lambda key, value: {key: value})
+        return FakeCollection({"region": self.value, **function(feature)})
+
+    def flatten(self):
+        return self
+
+
+class FakeImage:
+    """Reduces each region to its name, failing for the regions in fail."""
+
+    def __init__(self, fail=(), tag=True):
+        self.fail = fail
+        self.tag = tag
+        self.calls = []
+
+    def serialize(self):
+        return "image"
+
+    def reduceRegions(self, collection, **kwargs):
+        self.calls.append(collection.value)
+        return SimpleNamespace(getInfo=lambda: self.reduce(collection.value))
+
+    def reduce(self, value):
+        regions = value if isinstance(value, list) else [value]
+        features = []
+        for region in regions:
+            name = region.value["region"] if isinstance(region, FakeCollection) else region
+            if name in self.fail:
+                raise RuntimeError(f"cannot reduce {name}")
+            properties = {"mean": name}
+            if self.tag and isinstance(region, FakeCollection):
+                properties[BATCH_PROPERTY] = region.value[BATCH_PROPERTY]
+            features.append({"properties": properties})
+        return {"type": "FeatureCollection", "features": features}
+
+
+@pytest.fixture(autouse=True)
+def fake_ee(monkeypatch):
+    ee = SimpleNamespace(
+        Image=lambda image: image,
+        FeatureCollection=FakeCollection,
+    )
+    monkeypatch.setattr(batcher, "ee", ee)
+
+
+def submit(ee_batcher, image, region):
+    projection = SimpleNamespace(serialize=lambda: "EPSG:4326")
+    return ee_batcher.submit(image, region, 5000, projection, "mean", "reducer")
+
+
+def means(future):
+    return [f["properties"]["mean"] for f in future.result(1)["features"]]
+
+
+def test_merges_calls_and_splits_results():
+    image = FakeImage()
+    ee_batcher = EEBatcher(window=0.05, max_size=16)
+
+    futures = [submit(ee_batcher, image, region) for region in ("a", "b", "c")]
+
+    assert [means(future) for future in futures] == [["a"], ["b"], ["c"]]
+    assert len(image.calls) == 1
+
+
+def test_full_batch_is_evaluated_without_waiting():
+    image = FakeImage()
+    ee_batcher = EEBatcher(window=60, max_size=2)
+
+    first = submit(ee_batcher, image, "a")
+    second = submit(ee_batcher, image, "b")
+
+    assert first.done() and second.done()
+    assert [means(first), means(second)] == [["a"], ["b"]]
+
+
+def test_failed_batch_is_retried_per_caller():
+    image = FakeImage(fail=("b",))
+    ee_batcher = EEBatcher(window=0.05, max_size=16)
+
+    good, bad = submit(ee_batcher, image, "a"), submit(ee_batcher, image, "b")
+
+    assert means(good) == ["a"]
+    with pytest.raises(RuntimeError):
+        bad.result(1)
+    assert image.calls == [image.calls[0], "a", "b"]
+
+
+def test_unsplittable_result_fails_every_caller():
+    image = FakeImage(tag=False)
+    ee_batcher = EEBatcher(window=0.05, max_size=16)
+
+    futures = [submit(ee_batcher, image, region) for region in ("a", "b")]
+
+    for future in futures:
+        # a TimeoutError means the caller was never resolved
+        with pytest.raises(KeyError):
+            future.result(1)
+
+
+def test_image_key_skips_serialization():
+    image = MagicMock()
+    ee_batcher = EEBatcher(window=0.05, max_size=16)
+
+    key = ee_batcher.batch_key(image, 5000, MagicMock(), "mean", ("Rain", 2020))
+
+    assert key == (("Rain", 2020), 5000, "mean")
+    image.serialize.assert_not_called()
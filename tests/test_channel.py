@@ -0,0 +1,51 @@
+from src.channel import ConversationChannel
+
+
+def test_checkpoints_survive_the_channel(tmp_path):
+    path = str(tmp_path / "conversations.sqlite3")
+    ConversationChannel(store_path=path).checkpoint("a", "memory", 0)
+
+    channel = ConversationChannel(store_path=path)
+
+    assert channel.history("a") == ("memory", 1)
+    assert channel.pop("a") == "memory"
+    assert channel.pop("a") is None
+
+
+def test_checkpoint_evicts_the_oldest(tmp_path):
+    channel = ConversationChannel(store_size=2, store_path=str(tmp_path / "c.sqlite3"))
+    for conversation_id in ("a", "b", "c"):
+        channel.checkpoint(conversation_id, conversation_id, 0)
+
+    assert channel.history("a") == (None, 0)
+    assert channel.history("c") == ("c", 1)
+
+
+def test_checkpoints_advance_the_version(tmp_path):
+    channel = ConversationChannel(store_path=str(tmp_path / "c.sqlite3"))
+
+    version = channel.checkpoint("a", "turn 1", 0)
+    version = channel.checkpoint("a", "turn 2", version)
+
+    assert channel.history("a") == ("turn 2", 2)
+
+
+def test_taken_over_conversation_is_not_overwritten(tmp_path):
+    channel = ConversationChannel(store_path=str(tmp_path / "c.sqlite3"))
+    _, version = channel.history("a")
+
+    # the client resends the in-flight turn over /jaltol/
+    assert channel.pop("a") is None
+
+    # the WebSocket finishes the turn afterwards
+    assert channel.checkpoint("a", "forked", version) is None
+    assert channel.history("a") == (None, 1)
+
+
+def test_connection_limit():
+    channel = ConversationChannel(max_connections=1)
+
+    assert channel.acquire()
+    assert not channel.acquire()
+    channel.release()
+    assert channel.acquire()
@@ -0,0 +1,25 @@
+import pytest
+
+from src.connections import GeocoderSession, SharedSessionAdapter
+
+
+class FakeSession:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+
+
+def test_geocoder_session_sends_its_proxies():
+    session = FakeSession()
+    proxies = {"https": "http://proxy:3128"}
+
+    GeocoderSession(session, proxies).get("https://nominatim", timeout=1)
+
+    assert session.calls == [("https://nominatim", {"proxies": proxies, "timeout": 1})]
+
+
+def test_ssl_context_is_rejected():
+    with pytest.raises(ValueError):
+        SharedSessionAdapter(ssl_context=object(), session=FakeSession())
@@ -0,0 +1,54 @@
+import threading
+from unittest.mock import MagicMock
+
+from src.components.registry import Dataset, DatasetComputation
+
+
+def dataset_computation() -> DatasetComputation:
+    return DatasetComputation(
+        Dataset(name="Rain", topic="Rainfall", asset_path="users/test/rain")
+    )
+
+
+def run_with_timeout(target, timeout: float = 5) -> bool:
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+def test_first_template_read_initializes_asset():
+    computation = dataset_computation()
+
+    assert run_with_timeout(lambda: computation.template)
+    assert computation._asset is not None
+    assert computation._template is not None
+
+
+def test_concurrent_first_calls_build_once():
+    computation = dataset_computation()
+    results = []
+
+    def read():
+        results.append((computation.template, computation.asset))
+
+    threads = [threading.Thread(target=read, daemon=True) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 8
+    assert len({id(template) for template, _ in results}) == 1
+    assert len({id(asset) for _, asset in results}) == 1
+
+
+def test_image_of_a_year_is_built_once():
+    computation = dataset_computation()
+    computation._template = MagicMock()
+
+    computation.image(2020)
+    computation.image(2020)
+    computation.image(2020, "calendar")
+
+    assert computation._template.call.call_count == 2
@@ -0,0 +1,33 @@
+from src.replay import percentile, report
+
+
+def test_percentile_nearest_rank():
+    values = [5, 1, 4, 2, 3]
+
+    assert percentile(values, 0.5) == 3
+    assert percentile(values, 0.95) == 5
+    assert percentile(values, 0) == 1
+
+
+def test_report_compares_query_durations():
+    records = [
+        {"id": "a", "t": 0, "dur": 2.0, "tools": [{"n": "Rain"}]},
+        {"id": "b", "t": 1, "dur": 4.0, "tools": [{"n": "Rain"}, {"n": "ET"}]},
+    ]
+    results = {
+        "a": {"latency": 3.0, "status": 200},
+        "b": {"latency": 5.0, "status": 500},
+    }
+    replayed = {
+        "a": {"dur": 1.0, "tools": [{"n": "Rain"}]},
+        "b": {"dur": 2.0, "tools": [{"n": "Rain"}]},
+    }
+
+    output = report(records, results, replayed, span=2.0)
+
+    assert output["recorded"]["mean"] == 3.0
+    assert output["recorded"]["throughput"] == 0.4
+    assert output["replayed"]["mean"] == 1.5
+    assert output["replayed_round_trip"]["mean"] == 4.0
+    assert output["errors"] == 1
+    assert output["tool_mismatches"] == ["b"]
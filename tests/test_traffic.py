@@ -0,0 +1,55 @@
+import pytest
+
+from src.traffic import scrub, scrub_json
+
+
+@pytest.mark.parametrize(
+    "phone",
+    [
+        "9876543210",
+        "98765 43210",
+        "98765-43210",
+        "987 654 3210",
+        "+91 98765 43210",
+        "+919876543210",
+        "09876543210",
+        "080 2345 6789",
+        "080-23456789",
+        "+44 20 7946 0958",
+    ],
+)
+def test_scrub_phone_numbers(phone):
+    assert scrub(f"call me at {phone} please") == "call me at [PHONE] please"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "rainfall of Gubbi in 2015 2016 2017",
+        "12.9716, 77.5946",
+        "evapotranspiration was 1234.56 mm",
+        "village code 627384",
+    ],
+)
+def test_scrub_keeps_years_and_values(text):
+    assert scrub(text) == text
+
+
+def test_scrub_emails():
+    assert scrub("write to a.b+c@example.org") == "write to [EMAIL]"
+
+
+def test_scrub_json_redacts_secrets_and_scrubs_strings():
+    value = {
+        "access_token": "ya29.secret",
+        "messages": [{"content": "I am at 98765 43210"}],
+        "key": "kept",
+        "count": 3,
+    }
+
+    assert scrub_json(value) == {
+        "access_token": "REDACTED",
+        "messages": [{"content": "I am at [PHONE]"}],
+        "key": "kept",
+        "count": 3,
+    }